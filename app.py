@@ -1,14 +1,28 @@
 import os
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+import tempfile
+import uuid
+from functools import wraps
+import msgspec
+import redis
+from flask import Flask, g, render_template, stream_template, make_response, request, redirect, url_for, flash, session, jsonify, get_flashed_messages
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import cast, insert, literal, null, select, union_all
 from sqlalchemy.orm import DeclarativeBase
+from flask.json.provider import DefaultJSONProvider
+from flask_caching import Cache
+from flask_session import Session
+from jinja2 import FileSystemBytecodeCache
+from rq import Queue
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.middleware.proxy_fix import ProxyFix
 from workout_generator import WorkoutGenerator
-from openai_integration import generate_weekly_workout_plan, get_workout_goal_suggestions
+from openai_integration import WeeklyPlan, generate_weekly_workout_plan, get_workout_goal_suggestions, load_token_encoder
 from simple_weekly_generator import generate_simple_weekly_plan
 from datetime import datetime, timedelta
-import json
+import orjson
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -18,29 +32,121 @@ class Base(DeclarativeBase):
     pass
 
 
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes and decodes with orjson."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def _orjson_dumps(obj):
+    """Serialize JSON column values with orjson (SQLAlchemy expects a str)."""
+    return orjson.dumps(obj).decode()
+
+
 db = SQLAlchemy(model_class=Base)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+# Server-side sessions and usage counters (Redis when configured, signed cookies otherwise)
+REDIS_URL = os.environ.get("REDIS_URL")
+redis_client = redis.Redis.from_url(REDIS_URL) if REDIS_URL else None
+if redis_client is not None:
+    app.config["SESSION_TYPE"] = "redis"
+    app.config["SESSION_REDIS"] = redis_client
+    Session(app)
+
+# With WEEKLY_PLAN_QUEUE=rq (and Redis), weekly plans are built with OpenAI by a
+# separate `rq worker` process; otherwise the template generator runs inline
+WEEKLY_PLAN_QUEUE = os.environ.get("WEEKLY_PLAN_QUEUE", "")
+WEEKLY_PLAN_RESULT_TTL = 3600
+task_queue = (Queue(connection=redis_client)
+              if redis_client is not None and WEEKLY_PLAN_QUEUE == "rq" else None)
+
+# Signed-in users' subscription tiers are cached in Redis (see get_subscription_tier)
+TIER_CACHE_TTL = 3600
+
+# Shared cache for rendered pages and computed data
+if REDIS_URL:
+    cache = Cache(app, config={"CACHE_TYPE": "RedisCache", "CACHE_REDIS_URL": REDIS_URL})
+else:
+    cache = Cache(app, config={"CACHE_TYPE": "SimpleCache"})
+
 # Database configuration
 app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL") or "sqlite:///fitness_app.db"
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
+    "pool_size": 20,
+    "max_overflow": 40,
+    "json_serializer": _orjson_dumps,
+    "json_deserializer": orjson.loads,
 }
 
+# Reject oversized bodies before Werkzeug buffers or parses them
+app.config["MAX_CONTENT_LENGTH"] = 256 * 1024
+app.config["MAX_FORM_PARTS"] = 100
+
 db.init_app(app)
 
+# Persist compiled templates so restarted workers skip the Jinja compile step.
+# Template auto-reload stays tied to debug mode (Flask's default).
+JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "jinja_cache")
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
 # Create database tables
 with app.app_context():
     import models
     db.create_all()
 
+from models import User, WorkoutPlan, WorkoutProgress, CustomExercise
+
+# Plan columns rendered by the dashboard's saved plan list
+PLAN_LIST_COLUMNS = (
+    WorkoutPlan.id,
+    WorkoutPlan.name,
+    WorkoutPlan.plan_type,
+    WorkoutPlan.duration,
+    WorkoutPlan.created_at,
+)
+
+# Progress columns rendered by the dashboard and the progress tracker
+PROGRESS_COLUMNS = (
+    WorkoutProgress.date,
+    WorkoutProgress.duration_minutes,
+    WorkoutProgress.exercises_completed,
+    WorkoutProgress.total_exercises,
+    WorkoutProgress.difficulty_rating,
+    WorkoutProgress.notes,
+)
+
 # Initialize workout generator
 workout_gen = WorkoutGenerator()
+# Most requests use one of a few selections (bodyweight is checked by default);
+# build their pools now so preloaded workers share them
+workout_gen.prebuild_pools((
+    ('bodyweight',),
+    ('bodyweight', 'dumbbells'),
+    ('bodyweight', 'dumbbells', 'bench'),
+    ('bodyweight', 'dumbbells', 'kettlebells', 'resistance_bands',
+     'pull_up_bar', 'bench', 'barbell', 'medicine_ball'),
+))
+
+# Load the prompt tokenizer before serving, so no request waits on its download
+load_token_encoder()
 
 # Subscription tier limits and pricing
 SUBSCRIPTION_TIERS = {
@@ -71,36 +177,169 @@ SUBSCRIPTION_TIERS = {
 }
 
 
+def _usage_key():
+    """Return the Redis hash key holding this browser session's usage counters."""
+    # Demo users all share the 'demo_user' id, so counters are keyed per session
+    if 'usage_id' not in session:
+        session['usage_id'] = uuid.uuid4().hex
+    return f"usage:{session['usage_id']}"
+
+
+def increment_usage(counter):
+    """Increment a usage counter ('daily_workouts' or 'weekly_plans')."""
+    if redis_client is None:
+        session[f'{counter}_count'] = session.get(f'{counter}_count', 0) + 1
+        return
+    # HINCRBY is atomic, so concurrent requests across workers never lose an update.
+    # Expiring the hash at midnight resets the daily counters without any DB write.
+    usage_key = _usage_key()
+    next_midnight = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
+    pipe = redis_client.pipeline()
+    pipe.hincrby(usage_key, counter, 1)
+    pipe.expireat(usage_key, next_midnight)
+    pipe.execute()
+
+
+def get_usage():
+    """Return the current session's usage counters."""
+    if redis_client is None:
+        return {
+            'daily_workouts': session.get('daily_workouts_count', 0),
+            'weekly_plans': session.get('weekly_plans_count', 0)
+        }
+    if 'usage_id' not in session:
+        return {'daily_workouts': 0, 'weekly_plans': 0}
+    # One HGETALL; memoizing it in the (Redis) cache would cost more round trips than it saves
+    counters = redis_client.hgetall(_usage_key())
+    return {
+        'daily_workouts': int(counters.get(b'daily_workouts', 0)),
+        'weekly_plans': int(counters.get(b'weekly_plans', 0))
+    }
+
+
+def get_subscription_tier():
+    """Return the current visitor's subscription tier ('free', 'premium' or 'pro').
+
+    Looked up once per request and kept on flask.g, since both the view and the
+    template context processor ask for it.
+    """
+    if 'subscription_tier' not in g:
+        g.subscription_tier = _lookup_subscription_tier()
+    return g.subscription_tier
+
+
+def _lookup_subscription_tier():
+    """Read the visitor's tier from the session, Redis or the database."""
+    user_id = session.get('user_id', 'demo_user')
+    # Demo visitors only have the tier chosen on the pricing page
+    if user_id == 'demo_user':
+        return session.get('subscription_tier', 'free')
+    if redis_client is not None:
+        cached = redis_client.get(f"tier:{user_id}")
+        if cached is not None:
+            return cached.decode()
+    user = db.session.get(User, user_id)
+    tier = user.subscription_tier if user and user.subscription_tier else 'free'
+    if redis_client is not None:
+        redis_client.setex(f"tier:{user_id}", TIER_CACHE_TTL, tier)
+    return tier
+
+
+@app.context_processor
+def inject_subscription_tier():
+    """Make the visitor's tier available to every template (navbar badge, upsells)."""
+    return {'subscription_tier': get_subscription_tier()}
+
+
+def http_cacheable(max_age):
+    """Let browsers and CDNs reuse a page for anonymous visitors, answering revalidation with 304."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Decide before the view runs: rendering may consume flashes and empty the session
+            anonymous = not session
+            response = make_response(view(*args, **kwargs))
+            if not anonymous:
+                return response
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            response.add_etag()
+            return response.make_conditional(request)
+        return wrapper
+    return decorator
+
+
 @app.route('/')
+@http_cacheable(300)
+@cache.cached(timeout=300, unless=lambda: bool(session))
 def index():
-    """Render the main page with equipment selection and duration input."""
+    """Render the main page with equipment selection and duration input.
+
+    Anonymous visitors with an empty session all see the same page, so it is
+    served from the cache; any session state (flashes, usage, tier) bypasses it.
+    """
     goal_suggestions = get_workout_goal_suggestions()
     return render_template('index.html', 
                          goal_suggestions=goal_suggestions,
-                         subscription_tiers=SUBSCRIPTION_TIERS)
+                         subscription_tiers=SUBSCRIPTION_TIERS,
+                         usage=get_usage())
 
 
 @app.route('/pricing')
+@http_cacheable(300)
 def pricing():
     """Display pricing and subscription options."""
     return render_template('pricing.html', subscription_tiers=SUBSCRIPTION_TIERS)
 
 
+def _dashboard_rows(user_id):
+    """Fetch the dashboard's saved plans and recent progress with a single query.
+
+    Only the columns the dashboard renders are selected, as plain rows rather
+    than ORM objects; the JSON payload columns are left out (see plan_detail).
+    Each side is padded with typed NULLs for the other's columns so the two
+    can be combined with UNION ALL, and the ``kind`` column splits them again.
+    """
+    def padding(columns):
+        return [cast(null(), column.type).label(column.key) for column in columns]
+
+    plans = (
+        select(literal('plan').label('kind'), *PLAN_LIST_COLUMNS, *padding(PROGRESS_COLUMNS))
+        .where(WorkoutPlan.user_id == user_id)
+        .limit(10)
+        .subquery()
+    )
+    progress = (
+        select(literal('progress').label('kind'), *padding(PLAN_LIST_COLUMNS), *PROGRESS_COLUMNS)
+        .where(WorkoutProgress.user_id == user_id)
+        .order_by(WorkoutProgress.date.desc())
+        .limit(5)
+        .subquery()
+    )
+    combined = union_all(select(plans), select(progress))
+    rows = db.session.execute(
+        combined.order_by(combined.selected_columns.kind, combined.selected_columns.date.desc())
+    ).all()
+
+    saved_plans = [row for row in rows if row.kind == 'plan']
+    recent_progress = [row for row in rows if row.kind == 'progress']
+    return saved_plans, recent_progress
+
+
 @app.route('/dashboard')
 def dashboard():
     """User dashboard for premium features."""
     # For demo purposes, we'll simulate a user session
     user_id = session.get('user_id', 'demo_user')
     
-    # Get user's saved workout plans
-    from models import WorkoutPlan, WorkoutProgress
-    saved_plans = WorkoutPlan.query.filter_by(user_id=user_id).limit(10).all()
-    recent_progress = WorkoutProgress.query.filter_by(user_id=user_id).order_by(WorkoutProgress.date.desc()).limit(5).all()
+    # Get user's saved workout plans and recent progress in one round trip
+    saved_plans, recent_progress = _dashboard_rows(user_id)
     
     return render_template('dashboard.html', 
                          saved_plans=saved_plans,
                          recent_progress=recent_progress,
-                         subscription_tiers=SUBSCRIPTION_TIERS)
+                         subscription_tiers=SUBSCRIPTION_TIERS,
+                         usage=get_usage())
 
 
 @app.route('/workout', methods=['POST'])
@@ -133,18 +372,26 @@ def generate_workout():
         
         # Check subscription limits (simulated for demo)
         user_id = session.get('user_id', 'demo_user')
-        subscription_tier = session.get('subscription_tier', 'free')
+        subscription_tier = get_subscription_tier()
         
         # Demo usage limits check
         if subscription_tier == 'free' and plan_type == 'weekly':
-            weekly_count = session.get('weekly_plans_count', 0)
+            weekly_count = get_usage()['weekly_plans']
             if weekly_count >= SUBSCRIPTION_TIERS['free']['weekly_plans']:
                 flash('Free users are limited to 1 weekly plan. Upgrade to Premium for unlimited weekly plans!', 'warning')
                 return redirect(url_for('pricing'))
         
         if plan_type == 'weekly':
-            # Use fallback generator for reliability
             try:
+                if task_queue is not None:
+                    # Keep the request thread free; the results page polls until the worker is done
+                    job = task_queue.enqueue(build_weekly_plan,
+                                             args=(equipment, duration, weekly_goal),
+                                             result_ttl=WEEKLY_PLAN_RESULT_TTL)
+                    increment_usage('weekly_plans')
+                    return redirect(url_for('weekly_plan_result', job_id=job.id))
+
+                # Use fallback generator for reliability
                 weekly_plan = generate_simple_weekly_plan(
                     equipment=equipment,
                     daily_duration=duration,
@@ -152,14 +399,9 @@ def generate_workout():
                 )
                 
                 # Update usage counter for demo
-                session['weekly_plans_count'] = session.get('weekly_plans_count', 0) + 1
+                increment_usage('weekly_plans')
                 
-                return render_template('weekly_workout.html',
-                                     weekly_plan=weekly_plan,
-                                     equipment=equipment,
-                                     duration=duration,
-                                     weekly_goal=weekly_goal,
-                                     subscription_tier=subscription_tier)
+                return _render_weekly_plan(weekly_plan, equipment, duration, weekly_goal, subscription_tier)
             except Exception as e:
                 logging.error(f"Simple weekly plan generation failed: {str(e)}")
                 flash('Unable to generate weekly plan right now. Please try again or create a single workout instead.', 'error')
@@ -170,7 +412,7 @@ def generate_workout():
                 workout_plan = workout_gen.generate_workout(equipment, duration)
                 
                 # Update usage counter for demo
-                session['daily_workouts_count'] = session.get('daily_workouts_count', 0) + 1
+                increment_usage('daily_workouts')
                 
                 return render_template('workout.html',
                                      workout_plan=workout_plan,
@@ -188,42 +430,177 @@ def generate_workout():
         return redirect(url_for('index'))
 
 
+def build_weekly_plan(equipment, duration, weekly_goal):
+    """RQ job: build a weekly plan with OpenAI, falling back to a template plan on errors."""
+    return generate_weekly_workout_plan(equipment, duration, weekly_goal, workout_gen.exercises)
+
+
+def _render_weekly_plan(weekly_plan, equipment, duration, weekly_goal, subscription_tier):
+    """Stream the weekly plan page so the browser gets the shell while the days render.
+
+    Raises msgspec.ValidationError for a malformed plan. Errors raised once the
+    response has started streaming can no longer become a flash and redirect,
+    so the plan's shape is checked up front.
+    """
+    msgspec.convert(weekly_plan, WeeklyPlan)
+    # Consume pending flashes now: the session is saved before the body streams,
+    # so messages popped by the template would otherwise be shown again
+    get_flashed_messages(with_categories=True)
+    return app.response_class(stream_template('weekly_workout.html',
+                                              weekly_plan=weekly_plan,
+                                              equipment=equipment,
+                                              duration=duration,
+                                              weekly_goal=weekly_goal,
+                                              subscription_tier=subscription_tier))
+
+
+@app.route('/weekly-plan/<job_id>')
+def weekly_plan_result(job_id):
+    """Show a queued weekly plan, or a waiting page while the worker builds it."""
+    if task_queue is None:
+        return redirect(url_for('index'))
+    
+    try:
+        job = Job.fetch(job_id, connection=redis_client)
+    except NoSuchJobError:
+        flash('That weekly plan has expired. Please generate a new one.', 'warning')
+        return redirect(url_for('index'))
+    
+    if job.is_finished:
+        equipment, duration, weekly_goal = job.args
+        subscription_tier = get_subscription_tier()
+        try:
+            return _render_weekly_plan(job.return_value(), equipment, duration, weekly_goal, subscription_tier)
+        except msgspec.ValidationError as e:
+            logging.error(f"Weekly plan job {job_id} returned a malformed plan: {str(e)}")
+            flash('Unable to generate weekly plan right now. Please try again or create a single workout instead.', 'error')
+            return redirect(url_for('index'))
+    
+    if job.is_failed:
+        logging.error(f"Weekly plan job {job_id} failed")
+        flash('Unable to generate weekly plan right now. Please try again or create a single workout instead.', 'error')
+        return redirect(url_for('index'))
+    
+    return render_template('weekly_workout_pending.html', job_id=job_id)
+
+
+@app.route('/api/job/<job_id>')
+def job_status(job_id):
+    """API endpoint to poll the status of a queued weekly plan."""
+    if task_queue is None:
+        return jsonify({'status': 'missing'}), 404
+    
+    try:
+        job = Job.fetch(job_id, connection=redis_client)
+    except NoSuchJobError:
+        return jsonify({'status': 'missing'}), 404
+    
+    return jsonify({'status': job.get_status()})
+
+
+def _read_json_body():
+    """Parse the raw request body with orjson, returning None if it is not valid JSON."""
+    try:
+        return orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        return None
+
+
+def _workout_plan_fields(user_id, workout_data):
+    """Map a submitted workout payload onto WorkoutPlan column values."""
+    return {
+        'user_id': user_id,
+        'name': workout_data.get('name', 'My Workout'),
+        'plan_type': workout_data.get('plan_type', 'daily'),
+        'equipment': workout_data.get('equipment', []),
+        'duration': workout_data.get('duration', 30),
+        'weekly_goal': workout_data.get('weekly_goal', ''),
+        'plan_data': workout_data.get('plan_data', {})
+    }
+
+
+@app.route('/plan/<int:plan_id>')
+def plan_detail(plan_id):
+    """API endpoint returning one saved workout plan including its full plan data."""
+    user_id = session.get('user_id', 'demo_user')
+    plan = WorkoutPlan.query.filter_by(id=plan_id, user_id=user_id).first()
+    
+    if plan is None:
+        return jsonify({'error': 'Workout plan not found'}), 404
+    
+    return jsonify({
+        'id': plan.id,
+        'name': plan.name,
+        'plan_type': plan.plan_type,
+        'equipment': plan.equipment,
+        'duration': plan.duration,
+        'weekly_goal': plan.weekly_goal,
+        'plan_data': plan.plan_data,
+        'created_at': plan.created_at.isoformat() if plan.created_at else None,
+        'is_favorite': plan.is_favorite
+    })
+
+
 @app.route('/save-workout', methods=['POST'])
 def save_workout():
     """Save a workout plan for premium users."""
     try:
         user_id = session.get('user_id', 'demo_user')
-        subscription_tier = session.get('subscription_tier', 'free')
+        subscription_tier = get_subscription_tier()
         
         # Check if user has premium access
         if subscription_tier == 'free':
             return jsonify({'error': 'Premium feature. Please upgrade to save workouts.'}), 403
         
         # Get workout data from request
-        workout_data = request.get_json()
+        workout_data = _read_json_body()
+        if not isinstance(workout_data, dict):
+            return jsonify({'error': 'Invalid workout data.'}), 400
         
         # Save to database
-        from models import WorkoutPlan
-        new_plan = WorkoutPlan(
-            user_id=user_id,
-            name=workout_data.get('name', 'My Workout'),
-            plan_type=workout_data.get('plan_type', 'daily'),
-            equipment=json.dumps(workout_data.get('equipment', [])),
-            duration=workout_data.get('duration', 30),
-            weekly_goal=workout_data.get('weekly_goal', ''),
-            plan_data=json.dumps(workout_data.get('plan_data', {}))
-        )
+        new_plan = WorkoutPlan(**_workout_plan_fields(user_id, workout_data))
         
         db.session.add(new_plan)
         db.session.commit()
         
         return jsonify({'success': True, 'message': 'Workout saved successfully!'})
     
+    except RequestEntityTooLarge:
+        raise
     except Exception as e:
         logging.error(f"Error saving workout: {str(e)}")
         return jsonify({'error': 'Failed to save workout'}), 500
 
 
+@app.route('/save-workout-bulk', methods=['POST'])
+def save_workout_bulk():
+    """Save several workout plans (e.g. every day of a weekly plan) in a single INSERT."""
+    try:
+        user_id = session.get('user_id', 'demo_user')
+        subscription_tier = get_subscription_tier()
+        
+        # Check if user has premium access
+        if subscription_tier == 'free':
+            return jsonify({'error': 'Premium feature. Please upgrade to save workouts.'}), 403
+        
+        payload = _read_json_body()
+        plans = payload.get('plans') if isinstance(payload, dict) else None
+        if not plans or not isinstance(plans, list) or not all(isinstance(plan, dict) for plan in plans):
+            return jsonify({'error': 'Please provide a list of workout plans to save.'}), 400
+        
+        # One executemany round trip instead of a flush per plan
+        db.session.execute(insert(WorkoutPlan), [_workout_plan_fields(user_id, plan) for plan in plans])
+        db.session.commit()
+        
+        return jsonify({'success': True, 'message': f'{len(plans)} workouts saved successfully!'})
+    
+    except RequestEntityTooLarge:
+        raise
+    except Exception as e:
+        logging.error(f"Error saving workouts: {str(e)}")
+        return jsonify({'error': 'Failed to save workouts'}), 500
+
+
 @app.route('/subscribe/<tier>')
 def subscribe(tier):
     """Handle subscription upgrade (demo with placeholder Stripe integration)."""
@@ -233,7 +610,15 @@ def subscribe(tier):
     
     # For demo purposes, we'll simulate successful subscription
     session['subscription_tier'] = tier
-    session['user_id'] = 'demo_user'
+    g.subscription_tier = tier
+    user_id = session.setdefault('user_id', 'demo_user')
+    if user_id != 'demo_user':
+        user = db.session.get(User, user_id)
+        if user:
+            user.subscription_tier = tier
+            db.session.commit()
+        if redis_client is not None:
+            redis_client.setex(f"tier:{user_id}", TIER_CACHE_TTL, tier)
     
     flash(f'Successfully upgraded to {SUBSCRIPTION_TIERS[tier]["name"]} plan! (Demo mode)', 'success')
     return redirect(url_for('dashboard'))
@@ -242,7 +627,7 @@ def subscribe(tier):
 @app.route('/nutrition-planner')
 def nutrition_planner():
     """Nutrition planning feature (Pro only)."""
-    subscription_tier = session.get('subscription_tier', 'free')
+    subscription_tier = get_subscription_tier()
     
     if subscription_tier != 'pro':
         flash('Nutrition planning is a Pro feature. Please upgrade to access this feature.', 'warning')
@@ -254,7 +639,7 @@ def nutrition_planner():
 @app.route('/progress-tracker')
 def progress_tracker():
     """Progress tracking feature (Premium+)."""
-    subscription_tier = session.get('subscription_tier', 'free')
+    subscription_tier = get_subscription_tier()
     
     if subscription_tier == 'free':
         flash('Progress tracking is a Premium feature. Please upgrade to access this feature.', 'warning')
@@ -262,8 +647,12 @@ def progress_tracker():
     
     # Get user's progress data
     user_id = session.get('user_id', 'demo_user')
-    from models import WorkoutProgress
-    progress_data = WorkoutProgress.query.filter_by(user_id=user_id).order_by(WorkoutProgress.date.desc()).limit(30).all()
+    progress_data = db.session.execute(
+        select(*PROGRESS_COLUMNS)
+        .where(WorkoutProgress.user_id == user_id)
+        .order_by(WorkoutProgress.date.desc())
+        .limit(30)
+    ).all()
     
     return render_template('progress_tracker.html', progress_data=progress_data)
 
@@ -271,7 +660,7 @@ def progress_tracker():
 @app.route('/custom-exercises')
 def custom_exercises():
     """Custom exercise creation (Premium+)."""
-    subscription_tier = session.get('subscription_tier', 'free')
+    subscription_tier = get_subscription_tier()
     
     if subscription_tier == 'free':
         flash('Custom exercises is a Premium feature. Please upgrade to access this feature.', 'warning')
@@ -279,8 +668,11 @@ def custom_exercises():
     
     # Get user's custom exercises
     user_id = session.get('user_id', 'demo_user')
-    from models import CustomExercise
-    custom_exercises = CustomExercise.query.filter_by(user_id=user_id).all()
+    custom_exercises = db.session.execute(
+        select(CustomExercise.id, CustomExercise.name, CustomExercise.description,
+               CustomExercise.muscle_group, CustomExercise.difficulty_level)
+        .where(CustomExercise.user_id == user_id)
+    ).all()
     
     return render_template('custom_exercises.html', custom_exercises=custom_exercises)
 
@@ -289,11 +681,12 @@ def custom_exercises():
 def usage_stats():
     """API endpoint to get user's usage statistics."""
     user_id = session.get('user_id', 'demo_user')
-    subscription_tier = session.get('subscription_tier', 'free')
+    subscription_tier = get_subscription_tier()
     
     # Get current usage (simulated for demo)
-    daily_workouts = session.get('daily_workouts_count', 0)
-    weekly_plans = session.get('weekly_plans_count', 0)
+    usage = get_usage()
+    daily_workouts = usage['daily_workouts']
+    weekly_plans = usage['weekly_plans']
     
     tier_limits = SUBSCRIPTION_TIERS[subscription_tier]
     
@@ -321,7 +714,3 @@ def internal_error(error):
     """Handle 500 errors."""
     logging.error(f"Internal error: {str(error)}")
     return render_template('500.html'), 500
-
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Gunicorn configuration for FitnessPro.
+
+Gevent workers keep many requests in flight per process while they wait on
+PostgreSQL, Redis or OpenAI. Gunicorn picks this file up automatically.
+"""
+import gc
+import os
+
+from gevent import monkey
+
+# Patch before the app (and its SSL/socket users) is imported
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg  # noqa: E402
+
+# Make psycopg2 yield to other greenlets instead of blocking the worker
+patch_psycopg()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = "gevent"
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_connections = 1000
+
+# Import the app once in the master so workers share the exercise catalogue
+# and other module-level data copy-on-write. The reloader cannot work with a
+# preloaded app, so the --reload dev workflow sets GUNICORN_PRELOAD=0
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+
+def pre_fork(server, worker):
+    # Exclude everything loaded so far from garbage collection; otherwise the
+    # first collection in each worker writes to (and copies) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened while preloading (db.create_all) belong to the master
+    if not server.cfg.preload_app:
+        return
+    from app import app, db
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -2,7 +2,12 @@ from datetime import datetime, timedelta
 from app import db
 from flask_dance.consumer.storage.sqla import OAuthConsumerMixin
 from flask_login import UserMixin
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+# Native JSON storage: JSONB on PostgreSQL, the generic JSON type elsewhere (SQLite)
+JSONType = db.JSON().with_variant(JSONB(), 'postgresql')
 
 
 # User model for authentication
@@ -16,13 +21,13 @@ class User(UserMixin, db.Model):
     subscription_tier = db.Column(db.String, default='free')  # free, premium, pro
     subscription_end_date = db.Column(db.DateTime, nullable=True)
     stripe_customer_id = db.Column(db.String, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now)
-    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
+    updated_at = db.Column(db.DateTime, server_default=func.now(), onupdate=func.now())
     
     # Usage tracking for limits
     daily_workouts_count = db.Column(db.Integer, default=0)
     weekly_plans_count = db.Column(db.Integer, default=0)
-    last_usage_reset = db.Column(db.DateTime, default=datetime.now)
+    last_usage_reset = db.Column(db.DateTime, server_default=func.now())
     
     def is_premium(self):
         return self.subscription_tier in ['premium', 'pro']
@@ -32,16 +37,19 @@ class User(UserMixin, db.Model):
     
     def is_subscription_active(self):
         if self.subscription_end_date:
-            return datetime.now() < self.subscription_end_date
+            return datetime.utcnow() < self.subscription_end_date
         return False
     
     def reset_daily_limits_if_needed(self):
-        """Reset daily usage counters if it's a new day"""
-        if self.last_usage_reset.date() < datetime.now().date():
+        """Reset daily usage counters if it's a new day.
+
+        Live counters expire in Redis at midnight, so these columns are only an
+        archival snapshot; the reset is flushed with the caller's next commit.
+        """
+        if self.last_usage_reset.date() < datetime.utcnow().date():
             self.daily_workouts_count = 0
             self.weekly_plans_count = 0
-            self.last_usage_reset = datetime.now()
-            db.session.commit()
+            self.last_usage_reset = datetime.utcnow()
 
 
 # OAuth storage for Replit authentication
@@ -65,15 +73,20 @@ class WorkoutPlan(db.Model):
     user_id = db.Column(db.String, db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
     plan_type = db.Column(db.String(50), nullable=False)  # single, weekly
-    equipment = db.Column(db.Text)  # JSON string
+    equipment = db.Column(JSONType)  # list of equipment keys
     duration = db.Column(db.Integer)
     weekly_goal = db.Column(db.String(200))
-    plan_data = db.Column(db.Text)  # JSON string of workout data
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    plan_data = db.Column(JSONType)  # workout data
+    created_at = db.Column(db.DateTime, server_default=func.now())
     is_favorite = db.Column(db.Boolean, default=False)
     
     user = db.relationship('User', backref='workout_plans')
 
+    __table_args__ = (
+        db.Index('ix_plans_user_created', 'user_id', 'created_at'),
+        db.Index('ix_plans_equipment', 'equipment', postgresql_using='gin'),
+    )
+
 
 # Progress tracking for premium users
 class WorkoutProgress(db.Model):
@@ -91,6 +104,8 @@ class WorkoutProgress(db.Model):
     user = db.relationship('User', backref='progress_entries')
     workout_plan = db.relationship('WorkoutPlan', backref='progress_entries')
 
+    __table_args__ = (db.Index('ix_progress_user_date', 'user_id', 'date'),)
+
 
 # Nutrition plans for pro users
 class NutritionPlan(db.Model):
@@ -100,9 +115,9 @@ class NutritionPlan(db.Model):
     name = db.Column(db.String(200), nullable=False)
     goal = db.Column(db.String(100))  # weight_loss, muscle_gain, maintenance
     daily_calories = db.Column(db.Integer)
-    macros = db.Column(db.Text)  # JSON string of macro targets
-    meal_plan = db.Column(db.Text)  # JSON string of meal plans
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    macros = db.Column(JSONType)  # macro targets
+    meal_plan = db.Column(JSONType)  # meal plans
+    created_at = db.Column(db.DateTime, server_default=func.now())
     
     user = db.relationship('User', backref='nutrition_plans')
 
@@ -115,13 +130,15 @@ class CustomExercise(db.Model):
     name = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     muscle_group = db.Column(db.String(100))
-    equipment_needed = db.Column(db.Text)  # JSON string
+    equipment_needed = db.Column(JSONType)  # list of equipment keys
     difficulty_level = db.Column(db.Integer)  # 1-5 scale
     instructions = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.now)
+    created_at = db.Column(db.DateTime, server_default=func.now())
     
     user = db.relationship('User', backref='custom_exercises')
 
+    __table_args__ = (db.Index('ix_custom_ex_user', 'user_id'),)
+
 
 # Subscription payments tracking
 class Payment(db.Model):
@@ -132,7 +149,9 @@ class Payment(db.Model):
     amount = db.Column(db.Integer)  # Amount in cents
     currency = db.Column(db.String, default='usd')
     subscription_tier = db.Column(db.String, nullable=False)
-    payment_date = db.Column(db.DateTime, default=datetime.now)
+    payment_date = db.Column(db.DateTime, server_default=func.now())
     status = db.Column(db.String, default='pending')
     
-    user = db.relationship('User', backref='payments')
\ No newline at end of file
+    user = db.relationship('User', backref='payments')
+
+    __table_args__ = (db.Index('ix_payments_user', 'user_id'),)
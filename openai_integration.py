@@ -1,260 +1,650 @@
-import json
+import asyncio
+import copy
+import hashlib
+import io
+import logging
 import os
-from typing import Dict, List, Any
+import re
+import threading
+import time
+import weakref
+from functools import lru_cache
+from typing import Dict, Iterator, List, Any, TypedDict, Union
 
-# the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-# do not change this unless explicitly requested by the user
-from openai import OpenAI
+import msgspec
+import orjson
+from cachetools import TTLCache
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+
+from simple_weekly_generator import RECOVERY_ACTIVITIES, weekly_structure_for_goal
 
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-openai_client = OpenAI(
-    api_key=OPENAI_API_KEY,
-    timeout=10.0  # Much shorter timeout - 10 seconds max
+
+
+# The OpenAI SDK (and httpx, pydantic...) is imported and the clients are built
+# on first use, so processes that never call the API start faster.
+# TLS connections are kept alive between calls and requests are multiplexed
+# over HTTP/2; connection failures are retried once at the transport level.
+@lru_cache(maxsize=1)
+def _openai_client():
+    """Return the shared sync OpenAI client, creating it on first use."""
+    import httpx
+    from openai import DefaultHttpxClient, OpenAI
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=10.0,  # Much shorter timeout - 10 seconds max
+        max_retries=0,  # retried by _retry_transient instead
+        http_client=DefaultHttpxClient(
+            transport=httpx.HTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+                retries=1
+            )
+        )
+    )
+
+
+def _async_openai_client():
+    """Return the running event loop's AsyncOpenAI client, creating it on first use.
+
+    The client's connection pool belongs to the loop it was first used on. The
+    Flask app only uses the sync client; the per-loop cache protects asyncio
+    hosts that run several loops over the process's lifetime (e.g. one
+    asyncio.run per job). Each loop gets its own client, dropped with the loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = _build_async_openai_client()
+    return client
+
+
+def _build_async_openai_client():
+    """Create an AsyncOpenAI client with the same transport settings as the sync one."""
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=10.0,
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+                retries=1
+            )
+        )
+    )
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Return whether an API error is worth retrying (timeouts, dropped connections, rate limits)."""
+    from openai import APIConnectionError, APITimeoutError, RateLimitError
+    return isinstance(error, (APITimeoutError, APIConnectionError, RateLimitError))
+
+
+# Transient API failures get one more attempt after a short jittered backoff;
+# per-attempt timeouts are kept short so a retry still beats the fallback
+_retry_transient = retry(
+    stop=stop_after_attempt(2),
+    wait=wait_exponential_jitter(initial=0.2, max=1.0),
+    retry=retry_if_exception(_is_transient),
+    reraise=True
 )
 
+# Processing tier for plan requests; priority trades a higher price for lower
+# latency. Set OPENAI_SERVICE_TIER to "auto" or "default" to opt out.
+OPENAI_SERVICE_TIER = os.environ.get("OPENAI_SERVICE_TIER", "priority")
 
-def generate_weekly_workout_plan(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Generate a weekly workout plan using GPT-4o based on user preferences and available exercises."""
-    
+# Upper bound on concurrent requests per event loop from the async generators
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+
+# Async clients and semaphores are bound to the event loop that first uses
+# them, so they are kept per loop (see _async_openai_client, _loop_semaphore)
+_async_clients = weakref.WeakKeyDictionary()
+_loop_semaphores = weakref.WeakKeyDictionary()
+
+
+def _loop_semaphore() -> asyncio.Semaphore:
+    """Return the running event loop's OPENAI_MAX_CONCURRENCY semaphore."""
+    loop = asyncio.get_running_loop()
+    semaphore = _loop_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _loop_semaphores[loop] = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    return semaphore
+
+
+# Validated plans keyed by request (see _plan_cache_key); identical requests
+# from different users are answered without another OpenAI call
+PLAN_CACHE_TTL = 24 * 3600
+_plan_cache = TTLCache(maxsize=256, ttl=PLAN_CACHE_TTL)
+_plan_cache_lock = threading.Lock()
+
+
+class PlannedExercise(TypedDict, total=False):
+    name: str
+    sets: Union[int, str]
+    reps: Union[int, str]
+    rest_seconds: Union[int, str]
+    instructions: str
+    muscle_group: str
+
+
+class DailyWorkout(TypedDict, total=False):
+    focus: str
+    description: str
+    rest_day: bool
+    exercises: List[PlannedExercise]
+    duration_minutes: Union[int, float]
+    warmup: str
+    cooldown: str
+    recovery_activities: List[str]
+
+
+class WeeklyPlan(TypedDict):
+    """Shape of a model-generated weekly plan; keys not rendered by weekly_workout.html are dropped."""
+    weekly_goal: str
+    total_weekly_duration: Union[int, float]
+    plan_description: str
+    daily_workouts: Dict[str, DailyWorkout]
+    weekly_tips: List[str]
+
+
+# Decodes and validates in one pass, producing plain dicts for the templates
+_weekly_plan_decoder = msgspec.json.Decoder(WeeklyPlan)
+_daily_workout_decoder = msgspec.json.Decoder(DailyWorkout)
+
+
+# Weekly plans default to gpt-4o-mini; gpt-4o is reserved for goals that need
+# more careful programming (see _select_model)
+DEFAULT_MODEL = "gpt-4o-mini"
+COMPLEX_GOAL_MODEL = "gpt-4o"
+COMPLEX_GOAL_KEYWORDS = ("rehabilitation", "athletic performance", "injury")
+
+
+SYSTEM_PROMPT = (
+    "You are a professional fitness trainer creating personalized weekly workout plans. "
+    "Always respond with valid JSON matching the exact structure requested. "
+    "Focus on balanced, safe, and effective workout programming."
+)
+
+
+# The response shape is described in one compact block rather than a full JSON
+# example to keep the prompt (and time to first token) small. Lines indented
+# further than the first level continue the previous line.
+_RAW_PROMPT = """
+    Create a 7-day workout plan.
+    Equipment: {equipment}
+    Daily duration: {duration} minutes
+    Weekly goal: {goal}
+    Exercise database (prefer these, or similar): {exercises}
+
+    Return JSON with keys: weekly_goal, total_weekly_duration (minutes), plan_description,
+        daily_workouts (monday to sunday), weekly_tips (3 strings).
+        Each day has focus, description, rest_day,
+        exercises [{{name, sets, reps, rest_seconds, instructions, muscle_group}}],
+        duration_minutes, warmup, cooldown.
+        Rest days have no exercises, duration_minutes 0 and a recovery_activities list.
+    Rules:
+        1-2 rest days; 4-8 exercises per workout day, fitting the duration;
+        vary muscle groups across the week; match intensity to the goal; short form instructions.
+"""
+
+
+# Prompt for a single day, used by generate_weekly_workout_plan_parallel
+_RAW_DAY_PROMPT = """
+    Create the {day} session of a 7-day workout plan.
+    Focus: {focus}
+    Equipment: {equipment}
+    Duration: {duration} minutes
+    Weekly goal: {goal}
+    Exercise database (prefer these, or similar): {exercises}
+
+    Return JSON with keys: focus, description, rest_day (false),
+        exercises [{{name, sets, reps, rest_seconds, instructions, muscle_group}}],
+        duration_minutes, warmup, cooldown.
+    Rules: 4-6 exercises fitting the duration; instructions under 10 words.
+"""
+
+
+def _compact_prompt(raw: str) -> str:
+    """Collapse the indentation and line wrapping of a prompt so it costs no extra tokens."""
+    text = re.sub(r'\n[ \t]{8,}', ' ', raw)
+    text = re.sub(r'[ \t]+', ' ', text)
+    return re.sub(r' ?\n ?', '\n', text).strip()
+
+
+_PROMPT_TEMPLATE = _compact_prompt(_RAW_PROMPT)
+_DAY_PROMPT_TEMPLATE = _compact_prompt(_RAW_DAY_PROMPT)
+
+
+# Upper bound on the tokens spent on the exercise database in a prompt
+EXERCISE_TOKEN_BUDGET = 400
+
+
+# The gpt-4o tokenizer, once loaded (see load_token_encoder); a failed load is
+# retried in the background after TOKEN_ENCODER_RETRY_SECONDS
+TOKEN_ENCODER_RETRY_SECONDS = 300
+_encoder = None
+_encoder_retry_at = 0.0
+_encoder_lock = threading.Lock()
+
+
+def load_token_encoder() -> bool:
+    """Load the gpt-4o tokenizer and return whether it is available.
+
+    tiktoken downloads the encoding unless it is already in TIKTOKEN_CACHE_DIR,
+    so this is called at startup rather than while handling a request.
+    """
+    global _encoder, _encoder_retry_at
+    if _encoder is not None:
+        return True
+    if not _encoder_lock.acquire(blocking=False):
+        return False  # another load is in progress
+    try:
+        import tiktoken
+        _encoder = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        _encoder_retry_at = time.monotonic() + TOKEN_ENCODER_RETRY_SECONDS
+        logging.warning(f"tiktoken encoding unavailable, estimating prompt tokens: {str(e)}")
+        return False
+    finally:
+        _encoder_lock.release()
+    # Summaries built from estimates are rebuilt with real counts
+    _build_exercise_summary_json.cache_clear()
+    return True
+
+
+def _token_encoder():
+    """Return the tokenizer, or None while it is unavailable (token counts are then estimated).
+
+    Never downloads on the request path: a missing encoder is loaded in a
+    background thread, at most once per TOKEN_ENCODER_RETRY_SECONDS.
+    """
+    global _encoder_retry_at
+    if _encoder is None and time.monotonic() >= _encoder_retry_at:
+        _encoder_retry_at = time.monotonic() + TOKEN_ENCODER_RETRY_SECONDS
+        threading.Thread(target=load_token_encoder, daemon=True).start()
+    return _encoder
+
+
+def _count_tokens(text: str) -> int:
+    """Count the tokens in text, or estimate them at four characters per token."""
+    encoder = _token_encoder()
+    if encoder is None:
+        return len(text) // 4 + 1
+    return len(encoder.encode(text))
+
+
+@lru_cache(maxsize=32)
+def _build_exercise_summary_json(exercises_key: tuple) -> str:
+    """Serialise the exercise summary embedded in the prompt.
+
+    Exercises are added in order until EXERCISE_TOKEN_BUDGET is reached, so the
+    prompt size does not depend on how verbose the catalogue is. The catalogue
+    rarely changes between calls, so the JSON is memoized on the
+    (name, type, muscle_group, equipment_needed) tuples of the exercises sent.
+    """
+    exercise_summary = []
+    tokens = 0
+    for name, type_, muscle_group, equipment_needed in exercises_key:
+        entry = {"name": name, "type": type_, "muscle_group": muscle_group, "equipment_needed": list(equipment_needed)}
+        tokens += _count_tokens(orjson.dumps(entry).decode())
+        if tokens > EXERCISE_TOKEN_BUDGET:
+            break
+        exercise_summary.append(entry)
+    return orjson.dumps(exercise_summary).decode()
+
+
+def _exercise_summary(exercises: List[Dict[str, Any]], max_exercises: int) -> str:
+    """Return the exercise database JSON embedded in plan prompts."""
+    # Limit the number of exercises to reduce prompt size
+    exercises_key = tuple(
+        (exercise.get("name", ""), exercise.get("type", ""), exercise.get("muscle_group", ""),
+         tuple(exercise.get("equipment_needed", [])))
+        for exercise in exercises[:max_exercises]
+    )
+    return _build_exercise_summary_json(exercises_key)
+
+
+def _build_weekly_plan_prompt(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], max_exercises: int = 15) -> str:
+    """Build the user prompt asking the model for a weekly plan."""
     # Prepare equipment list for the prompt
     equipment_str = ", ".join(equipment) if equipment else "bodyweight only"
     
-    # Prepare exercise database summary for context (limit to reduce prompt size)
-    exercise_summary = []
-    for exercise in exercises[:15]:  # Reduce to prevent timeout
-        exercise_summary.append({
-            "name": exercise.get("name", ""),
-            "type": exercise.get("type", ""),
-            "muscle_group": exercise.get("muscle_group", ""),
-            "equipment_needed": exercise.get("equipment_needed", [])
-        })
-    
-    prompt = f"""Create a comprehensive 7-day weekly workout plan with COMPLETE daily workout details:
-
-REQUIREMENTS:
-- Available Equipment: {equipment_str}
-- Daily Workout Duration: {daily_duration} minutes per session
-- Weekly Goal: {weekly_goal}
-- Use exercises from the provided database when possible
-
-AVAILABLE EXERCISES:
-{json.dumps(exercise_summary, indent=2)}
-
-WEEKLY PLAN STRUCTURE:
-Create a JSON response with exactly this structure:
-{{
-    "weekly_goal": "{weekly_goal}",
-    "total_weekly_duration": (total minutes),
-    "plan_description": "Brief overview of the weekly plan approach",
-    "daily_workouts": {{
-        "monday": {{
-            "focus": "primary muscle group or workout type",
-            "description": "brief description of the day's workout",
-            "rest_day": false,
+    return _PROMPT_TEMPLATE.format(
+        equipment=equipment_str,
+        duration=daily_duration,
+        goal=weekly_goal,
+        exercises=_exercise_summary(exercises, max_exercises)
+    )
+
+
+def _select_model(weekly_goal: str) -> str:
+    """Pick the model for a weekly plan: gpt-4o for rehab/performance goals, gpt-4o-mini otherwise."""
+    goal = weekly_goal.lower()
+    if any(keyword in goal for keyword in COMPLEX_GOAL_KEYWORDS):
+        return COMPLEX_GOAL_MODEL
+    return DEFAULT_MODEL
+
+
+def _completion_request(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 1500, timeout: float = 6.0) -> Dict[str, Any]:
+    """Return the streaming chat.completions.create arguments for a weekly plan."""
+    prompt = _build_weekly_plan_prompt(equipment, daily_duration, weekly_goal, exercises, max_exercises)
+    return {
+        "model": _select_model(weekly_goal),
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": max_tokens,
+        "timeout": timeout,
+        "temperature": 0.7,
+        "service_tier": OPENAI_SERVICE_TIER,
+        "stream": True
+    }
+
+
+def stream_weekly_workout_plan(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 1500, timeout: float = 6.0) -> Iterator[str]:
+    """Stream a weekly plan as raw JSON text, yielding each chunk as it arrives.
+
+    The concatenated chunks form the JSON document returned by
+    generate_weekly_workout_plan, so callers can forward them (e.g. over
+    server-sent events) and render days before the whole plan is finished.
+    API errors are raised to the caller.
+    """
+    stream = _openai_client().chat.completions.create(
+        **_completion_request(equipment, daily_duration, weekly_goal, exercises,
+                              max_exercises=max_exercises, max_tokens=max_tokens, timeout=timeout)
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+@_retry_transient
+def _collect_weekly_plan_text(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 1500, timeout: float = 6.0) -> str:
+    """Stream a weekly plan and return the complete JSON text, retrying transient failures."""
+    buffer = io.StringIO()
+    for content in stream_weekly_workout_plan(equipment, daily_duration, weekly_goal, exercises,
+                                              max_exercises=max_exercises, max_tokens=max_tokens, timeout=timeout):
+        buffer.write(content)
+    return buffer.getvalue()
+
+
+@_retry_transient
+async def _collect_weekly_plan_text_async(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 1500, timeout: float = 6.0) -> str:
+    """Async counterpart of _collect_weekly_plan_text, bounded by the loop's semaphore."""
+    async with _loop_semaphore():
+        stream = await _async_openai_client().chat.completions.create(
+            **_completion_request(equipment, daily_duration, weekly_goal, exercises,
+                                  max_exercises=max_exercises, max_tokens=max_tokens, timeout=timeout)
+        )
+        buffer = io.StringIO()
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                buffer.write(chunk.choices[0].delta.content)
+    return buffer.getvalue()
+
+
+def _plan_cache_key(equipment: List[str], daily_duration: int, weekly_goal: str) -> str:
+    """Return the response cache key for a weekly plan request."""
+    request_key = (sorted(equipment), daily_duration, weekly_goal.lower().strip())
+    return hashlib.sha256(orjson.dumps(request_key)).hexdigest()
+
+
+def _parse_weekly_plan(text: str) -> Dict[str, Any]:
+    """Parse the JSON weekly plan returned by the model, validating it against WeeklyPlan."""
+    return _weekly_plan_decoder.decode(text)
+
+
+# Static plan returned when OpenAI fails; built once and patched per request
+_FALLBACK_SKELETON = {
+    "daily_workouts": {
+        "monday": {
+            "focus": "Upper Body", 
+            "description": "Focus on chest, shoulders, and arms", 
+            "rest_day": False,
             "exercises": [
-                {{
-                    "name": "Exercise name from database or similar",
-                    "sets": 3,
-                    "reps": "10-12",
-                    "rest_seconds": 60,
-                    "instructions": "Brief form instructions",
-                    "muscle_group": "target muscle"
-                }}
+                {"name": "Push-ups", "sets": 3, "reps": "10-15", "rest_seconds": 60, "instructions": "Keep body straight", "muscle_group": "chest"},
+                {"name": "Shoulder raises", "sets": 3, "reps": "12-15", "rest_seconds": 45, "instructions": "Control the movement", "muscle_group": "shoulders"}
             ],
-            "duration_minutes": {daily_duration},
-            "warmup": "5-minute warm-up description",
-            "cooldown": "5-minute cool-down description"
-        }},
-        "tuesday": {{
-            "focus": "different muscle group",
-            "description": "brief description", 
-            "rest_day": false,
+            "duration_minutes": 0,
+            "warmup": "5 minutes of arm circles and light movement",
+            "cooldown": "5 minutes of upper body stretching"
+        },
+        "tuesday": {
+            "focus": "Lower Body", 
+            "description": "Focus on legs and glutes", 
+            "rest_day": False,
+            "exercises": [
+                {"name": "Squats", "sets": 3, "reps": "12-15", "rest_seconds": 90, "instructions": "Keep knees aligned", "muscle_group": "legs"},
+                {"name": "Lunges", "sets": 3, "reps": "10 each leg", "rest_seconds": 60, "instructions": "Step forward and down", "muscle_group": "legs"}
+            ],
+            "duration_minutes": 0,
+            "warmup": "5 minutes of leg swings and marching",
+            "cooldown": "5 minutes of leg stretching"
+        },
+        "wednesday": {
+            "focus": "Cardio", 
+            "description": "Cardiovascular endurance training", 
+            "rest_day": False,
             "exercises": [
-                {{
-                    "name": "Exercise name",
-                    "sets": 3,
-                    "reps": "8-10", 
-                    "rest_seconds": 90,
-                    "instructions": "Brief form instructions",
-                    "muscle_group": "target muscle"
-                }}
+                {"name": "Jumping jacks", "sets": 3, "reps": "30 seconds", "rest_seconds": 30, "instructions": "Keep rhythm steady", "muscle_group": "full body"},
+                {"name": "Mountain climbers", "sets": 3, "reps": "20 seconds", "rest_seconds": 40, "instructions": "Fast alternating legs", "muscle_group": "core"}
             ],
-            "duration_minutes": {daily_duration},
-            "warmup": "warm-up description",
-            "cooldown": "cool-down description"
-        }},
-        "wednesday": {{ ... }},
-        "thursday": {{ ... }},
-        "friday": {{ ... }},
-        "saturday": {{ ... }},
-        "sunday": {{
-            "focus": "Rest and Recovery",
-            "description": "Complete rest day for muscle recovery",
-            "rest_day": true,
+            "duration_minutes": 0,
+            "warmup": "5 minutes of light jogging in place",
+            "cooldown": "5 minutes of walking and deep breathing"
+        },
+        "thursday": {
+            "focus": "Upper Body", 
+            "description": "Focus on back and biceps", 
+            "rest_day": False,
+            "exercises": [
+                {"name": "Pull-ups or rows", "sets": 3, "reps": "8-12", "rest_seconds": 90, "instructions": "Pull with control", "muscle_group": "back"},
+                {"name": "Planks", "sets": 3, "reps": "30 seconds", "rest_seconds": 60, "instructions": "Keep body straight", "muscle_group": "core"}
+            ],
+            "duration_minutes": 0,
+            "warmup": "5 minutes of arm and back movement",
+            "cooldown": "5 minutes of upper body stretching"
+        },
+        "friday": {
+            "focus": "Full Body", 
+            "description": "Complete body workout", 
+            "rest_day": False,
+            "exercises": [
+                {"name": "Burpees", "sets": 3, "reps": "8-10", "rest_seconds": 90, "instructions": "Full body movement", "muscle_group": "full body"},
+                {"name": "Plank to push-up", "sets": 3, "reps": "5-8", "rest_seconds": 60, "instructions": "Smooth transition", "muscle_group": "full body"}
+            ],
+            "duration_minutes": 0,
+            "warmup": "5 minutes of full body movement",
+            "cooldown": "5 minutes of full body stretching"
+        },
+        "saturday": {
+            "focus": "Active Recovery", 
+            "description": "Light movement and stretching", 
+            "rest_day": False,
+            "exercises": [
+                {"name": "Gentle yoga flow", "sets": 1, "reps": "15 minutes", "rest_seconds": 0, "instructions": "Focus on breathing", "muscle_group": "flexibility"},
+                {"name": "Walking", "sets": 1, "reps": "15 minutes", "rest_seconds": 0, "instructions": "Light pace", "muscle_group": "cardio"}
+            ],
+            "duration_minutes": 0,
+            "warmup": "Light movement and breathing",
+            "cooldown": "Relaxation and stretching"
+        },
+        "sunday": {
+            "focus": "Rest and Recovery", 
+            "description": "Complete rest day for muscle recovery", 
+            "rest_day": True,
             "exercises": [],
             "duration_minutes": 0,
-            "recovery_activities": ["light stretching", "walk", "meditation"]
-        }}
-    }},
+            "recovery_activities": RECOVERY_ACTIVITIES
+        }
+    },
     "weekly_tips": [
-        "tip 1 about progression",
-        "tip 2 about nutrition", 
-        "tip 3 about recovery"
+        "Gradually increase intensity each week",
+        "Stay hydrated and maintain proper nutrition",
+        "Ensure adequate sleep for muscle recovery"
     ]
-}}
-
-GUIDELINES:
-- Include 1-2 rest days per week
-- Each workout day should have 4-8 exercises that fit the duration
-- Vary muscle groups and workout types across the week
-- Use exercises from the provided database when possible, or create similar ones
-- Include specific sets, reps, and rest periods for each exercise
-- Provide warm-up and cool-down for each workout day
-- Consider the weekly goal when planning intensity and focus
-- Keep daily sessions within the specified duration
-- Provide practical, actionable advice
-- Focus on progressive overload and recovery balance
-"""
+}
+
+
+def _fallback_weekly_plan(equipment: List[str], daily_duration: int, weekly_goal: str, error: Exception) -> Dict[str, Any]:
+    """Build the static weekly plan returned when OpenAI fails."""
+    equipment_str = ", ".join(equipment) if equipment else "bodyweight only"
+    plan = {
+        "weekly_goal": weekly_goal,
+        "total_weekly_duration": daily_duration * 6,  # 6 workout days
+        "plan_description": f"A balanced weekly plan focused on {weekly_goal.lower()} using {equipment_str}.",
+        **copy.deepcopy(_FALLBACK_SKELETON),
+        "error": f"OpenAI generation failed: {error}"
+    }
+    for day in plan["daily_workouts"].values():
+        if not day["rest_day"]:
+            day["duration_minutes"] = daily_duration
+    return plan
+
+
+def generate_weekly_workout_plan(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 1500, timeout: float = 6.0) -> Dict[str, Any]:
+    """Generate a weekly workout plan using OpenAI based on user preferences and available exercises."""
+    # Plans are cached as JSON so every caller gets its own copy to modify
+    cache_key = _plan_cache_key(equipment, daily_duration, weekly_goal)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(cache_key)
+    if cached is not None:
+        return orjson.loads(cached)
 
     try:
-        # Try with shorter prompt first to reduce timeout risk
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
+        text = _collect_weekly_plan_text(equipment, daily_duration, weekly_goal, exercises,
+                                         max_exercises=max_exercises, max_tokens=max_tokens, timeout=timeout)
+        result = _parse_weekly_plan(text)
+    except Exception as e:
+        # Log the specific error for debugging
+        logging.error(f"OpenAI API error: {str(e)}")
+        return _fallback_weekly_plan(equipment, daily_duration, weekly_goal, e)
+
+    # Only successful responses are cached; failures fall through to a retry next time
+    with _plan_cache_lock:
+        _plan_cache[cache_key] = orjson.dumps(result)
+    return result
+
+
+async def generate_weekly_workout_plan_async(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 1500, timeout: float = 6.0) -> Dict[str, Any]:
+    """Async variant of generate_weekly_workout_plan for asyncio hosts.
+
+    Shares the response cache and fallback with the sync version; at most
+    OPENAI_MAX_CONCURRENCY requests are in flight at once.
+    """
+    cache_key = _plan_cache_key(equipment, daily_duration, weekly_goal)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(cache_key)
+    if cached is not None:
+        return orjson.loads(cached)
+
+    try:
+        text = await _collect_weekly_plan_text_async(equipment, daily_duration, weekly_goal, exercises,
+                                                     max_exercises=max_exercises, max_tokens=max_tokens, timeout=timeout)
+        result = _parse_weekly_plan(text)
+    except Exception as e:
+        logging.error(f"OpenAI API error: {str(e)}")
+        return _fallback_weekly_plan(equipment, daily_duration, weekly_goal, e)
+
+    with _plan_cache_lock:
+        _plan_cache[cache_key] = orjson.dumps(result)
+    return result
+
+
+@_retry_transient
+async def _generate_day_async(day: str, focus: str, equipment_str: str, daily_duration: int, weekly_goal: str, exercise_summary: str, *, max_tokens: int, timeout: float) -> DailyWorkout:
+    """Ask the model for one day of a weekly plan."""
+    prompt = _DAY_PROMPT_TEMPLATE.format(
+        day=day.capitalize(),
+        focus=focus,
+        equipment=equipment_str,
+        duration=daily_duration,
+        goal=weekly_goal,
+        exercises=exercise_summary
+    )
+    async with _loop_semaphore():
+        response = await _async_openai_client().chat.completions.create(
+            model=_select_model(weekly_goal),
             messages=[
-                {
-                    "role": "system",
-                    "content": "You are a professional fitness trainer creating personalized weekly workout plans. "
-                    + "Always respond with valid JSON matching the exact structure requested. "
-                    + "Focus on balanced, safe, and effective workout programming."
-                },
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": prompt}
             ],
             response_format={"type": "json_object"},
-            max_tokens=2500,
-            temperature=0.7
+            max_tokens=max_tokens,
+            timeout=timeout,
+            temperature=0.7,
+            service_tier=OPENAI_SERVICE_TIER
         )
-        
-        result = json.loads(response.choices[0].message.content)
-        
-        # Validate the response structure
-        required_keys = ["weekly_goal", "total_weekly_duration", "plan_description", "daily_workouts", "weekly_tips"]
-        if not all(key in result for key in required_keys):
-            raise ValueError("Invalid response structure from GPT-4o")
-        
-        return result
-        
+    return _daily_workout_decoder.decode(response.choices[0].message.content)
+
+
+async def generate_weekly_workout_plan_parallel(equipment: List[str], daily_duration: int, weekly_goal: str, exercises: List[Dict[str, Any]], *, max_exercises: int = 15, max_tokens: int = 300, timeout: float = 6.0) -> Dict[str, Any]:
+    """Generate a weekly plan with one small concurrent request per workout day.
+
+    The week's layout comes from the simple generator's structure for the goal;
+    rest days are filled in locally. Seven short completions finish sooner than
+    one long one. Shares the response cache and fallback with the other variants.
+    """
+    cache_key = _plan_cache_key(equipment, daily_duration, weekly_goal)
+    with _plan_cache_lock:
+        cached = _plan_cache.get(cache_key)
+    if cached is not None:
+        return orjson.loads(cached)
+
+    equipment_str = ", ".join(equipment) if equipment else "bodyweight only"
+    exercise_summary = _exercise_summary(exercises, max_exercises)
+    weekly_structure = weekly_structure_for_goal(weekly_goal)
+    workout_days = [day for day, info in weekly_structure.items() if info['type'] != 'rest']
+
+    try:
+        results = await asyncio.gather(*[
+            _generate_day_async(day, weekly_structure[day]['focus'], equipment_str, daily_duration,
+                                weekly_goal, exercise_summary, max_tokens=max_tokens, timeout=timeout)
+            for day in workout_days
+        ])
     except Exception as e:
-        # Log the specific error for debugging
-        import logging
         logging.error(f"OpenAI API error: {str(e)}")
-        
-        # Fallback response if OpenAI fails
-        return {
-            "weekly_goal": weekly_goal,
-            "total_weekly_duration": daily_duration * 6,  # 6 workout days
-            "plan_description": f"A balanced weekly plan focused on {weekly_goal.lower()} using {equipment_str}.",
-            "daily_workouts": {
-                "monday": {
-                    "focus": "Upper Body", 
-                    "description": "Focus on chest, shoulders, and arms", 
-                    "rest_day": False,
-                    "exercises": [
-                        {"name": "Push-ups", "sets": 3, "reps": "10-15", "rest_seconds": 60, "instructions": "Keep body straight", "muscle_group": "chest"},
-                        {"name": "Shoulder raises", "sets": 3, "reps": "12-15", "rest_seconds": 45, "instructions": "Control the movement", "muscle_group": "shoulders"}
-                    ],
-                    "duration_minutes": daily_duration,
-                    "warmup": "5 minutes of arm circles and light movement",
-                    "cooldown": "5 minutes of upper body stretching"
-                },
-                "tuesday": {
-                    "focus": "Lower Body", 
-                    "description": "Focus on legs and glutes", 
-                    "rest_day": False,
-                    "exercises": [
-                        {"name": "Squats", "sets": 3, "reps": "12-15", "rest_seconds": 90, "instructions": "Keep knees aligned", "muscle_group": "legs"},
-                        {"name": "Lunges", "sets": 3, "reps": "10 each leg", "rest_seconds": 60, "instructions": "Step forward and down", "muscle_group": "legs"}
-                    ],
-                    "duration_minutes": daily_duration,
-                    "warmup": "5 minutes of leg swings and marching",
-                    "cooldown": "5 minutes of leg stretching"
-                },
-                "wednesday": {
-                    "focus": "Cardio", 
-                    "description": "Cardiovascular endurance training", 
-                    "rest_day": False,
-                    "exercises": [
-                        {"name": "Jumping jacks", "sets": 3, "reps": "30 seconds", "rest_seconds": 30, "instructions": "Keep rhythm steady", "muscle_group": "full body"},
-                        {"name": "Mountain climbers", "sets": 3, "reps": "20 seconds", "rest_seconds": 40, "instructions": "Fast alternating legs", "muscle_group": "core"}
-                    ],
-                    "duration_minutes": daily_duration,
-                    "warmup": "5 minutes of light jogging in place",
-                    "cooldown": "5 minutes of walking and deep breathing"
-                },
-                "thursday": {
-                    "focus": "Upper Body", 
-                    "description": "Focus on back and biceps", 
-                    "rest_day": False,
-                    "exercises": [
-                        {"name": "Pull-ups or rows", "sets": 3, "reps": "8-12", "rest_seconds": 90, "instructions": "Pull with control", "muscle_group": "back"},
-                        {"name": "Planks", "sets": 3, "reps": "30 seconds", "rest_seconds": 60, "instructions": "Keep body straight", "muscle_group": "core"}
-                    ],
-                    "duration_minutes": daily_duration,
-                    "warmup": "5 minutes of arm and back movement",
-                    "cooldown": "5 minutes of upper body stretching"
-                },
-                "friday": {
-                    "focus": "Full Body", 
-                    "description": "Complete body workout", 
-                    "rest_day": False,
-                    "exercises": [
-                        {"name": "Burpees", "sets": 3, "reps": "8-10", "rest_seconds": 90, "instructions": "Full body movement", "muscle_group": "full body"},
-                        {"name": "Plank to push-up", "sets": 3, "reps": "5-8", "rest_seconds": 60, "instructions": "Smooth transition", "muscle_group": "full body"}
-                    ],
-                    "duration_minutes": daily_duration,
-                    "warmup": "5 minutes of full body movement",
-                    "cooldown": "5 minutes of full body stretching"
-                },
-                "saturday": {
-                    "focus": "Active Recovery", 
-                    "description": "Light movement and stretching", 
-                    "rest_day": False,
-                    "exercises": [
-                        {"name": "Gentle yoga flow", "sets": 1, "reps": "15 minutes", "rest_seconds": 0, "instructions": "Focus on breathing", "muscle_group": "flexibility"},
-                        {"name": "Walking", "sets": 1, "reps": "15 minutes", "rest_seconds": 0, "instructions": "Light pace", "muscle_group": "cardio"}
-                    ],
-                    "duration_minutes": daily_duration,
-                    "warmup": "Light movement and breathing",
-                    "cooldown": "Relaxation and stretching"
-                },
-                "sunday": {
-                    "focus": "Rest and Recovery", 
-                    "description": "Complete rest day for muscle recovery", 
-                    "rest_day": True,
-                    "exercises": [],
-                    "duration_minutes": 0,
-                    "recovery_activities": ["light stretching", "walk", "meditation"]
-                }
-            },
-            "weekly_tips": [
-                "Gradually increase intensity each week",
-                "Stay hydrated and maintain proper nutrition",
-                "Ensure adequate sleep for muscle recovery"
-            ],
-            "error": f"OpenAI generation failed: {str(e)}"
-        }
+        return _fallback_weekly_plan(equipment, daily_duration, weekly_goal, e)
+
+    generated = dict(zip(workout_days, results))
+    daily_workouts = {}
+    for day in weekly_structure:
+        if day in generated:
+            daily_workouts[day] = {**generated[day], "rest_day": False}
+        else:
+            daily_workouts[day] = copy.deepcopy(_FALLBACK_SKELETON["daily_workouts"]["sunday"])
+
+    result = {
+        "weekly_goal": weekly_goal,
+        "total_weekly_duration": daily_duration * len(workout_days),
+        "plan_description": f"A {len(workout_days)}-day weekly plan focused on {weekly_goal.lower()} using {equipment_str}.",
+        "daily_workouts": daily_workouts,
+        "weekly_tips": list(_FALLBACK_SKELETON["weekly_tips"])
+    }
+    with _plan_cache_lock:
+        _plan_cache[cache_key] = orjson.dumps(result)
+    return result
+
+
+WORKOUT_GOAL_SUGGESTIONS = (
+    "Build muscle and strength",
+    "Lose weight and burn fat",
+    "Improve cardiovascular fitness",
+    "Increase flexibility and mobility",
+    "Build endurance and stamina",
+    "Tone and sculpt body",
+    "Improve athletic performance",
+    "General fitness and health",
+    "Stress relief and mental wellness",
+    "Rehabilitation and injury recovery"
+)
 
 
 def get_workout_goal_suggestions() -> List[str]:
     """Return a list of common workout goal suggestions for the UI."""
-    return [
-        "Build muscle and strength",
-        "Lose weight and burn fat", 
-        "Improve cardiovascular fitness",
-        "Increase flexibility and mobility",
-        "Build endurance and stamina",
-        "Tone and sculpt body",
-        "Improve athletic performance",
-        "General fitness and health",
-        "Stress relief and mental wellness",
-        "Rehabilitation and injury recovery"
-    ]
\ No newline at end of file
+    return list(WORKOUT_GOAL_SUGGESTIONS)
\ No newline at end of file
@@ -3,85 +3,135 @@ Simple weekly workout generator as a fallback when OpenAI is unavailable.
 """
 
 import random
-from typing import List, Dict, Any
+import sys
+from functools import lru_cache
+from typing import List, Dict, Any, FrozenSet, NamedTuple, Tuple
 
 
-def generate_simple_weekly_plan(equipment: List[str], daily_duration: int, weekly_goal: str) -> Dict[str, Any]:
-    """Generate a simple weekly workout plan without OpenAI."""
-    
-    # Equipment-based exercise templates
-    exercise_templates = {
-        'bodyweight': [
-            {"name": "Push-ups", "sets": 3, "reps": "10-15", "rest_seconds": 60, "muscle_group": "chest"},
-            {"name": "Squats", "sets": 3, "reps": "15-20", "rest_seconds": 60, "muscle_group": "legs"},
-            {"name": "Planks", "sets": 3, "reps": "30-45 sec", "rest_seconds": 45, "muscle_group": "core"},
-            {"name": "Lunges", "sets": 3, "reps": "10 each leg", "rest_seconds": 60, "muscle_group": "legs"},
-            {"name": "Mountain climbers", "sets": 3, "reps": "20 sec", "rest_seconds": 40, "muscle_group": "cardio"},
-            {"name": "Burpees", "sets": 3, "reps": "8-10", "rest_seconds": 90, "muscle_group": "full body"},
-            {"name": "Jumping jacks", "sets": 3, "reps": "30 sec", "rest_seconds": 30, "muscle_group": "cardio"}
-        ],
-        'dumbbells': [
-            {"name": "Dumbbell bench press", "sets": 3, "reps": "10-12", "rest_seconds": 90, "muscle_group": "chest"},
-            {"name": "Dumbbell rows", "sets": 3, "reps": "10-12", "rest_seconds": 90, "muscle_group": "back"},
-            {"name": "Dumbbell squats", "sets": 3, "reps": "12-15", "rest_seconds": 90, "muscle_group": "legs"},
-            {"name": "Dumbbell shoulder press", "sets": 3, "reps": "10-12", "rest_seconds": 75, "muscle_group": "shoulders"},
-            {"name": "Dumbbell bicep curls", "sets": 3, "reps": "12-15", "rest_seconds": 60, "muscle_group": "arms"}
-        ],
-        'kettlebells': [
-            {"name": "Kettlebell swings", "sets": 3, "reps": "15-20", "rest_seconds": 90, "muscle_group": "full body"},
-            {"name": "Kettlebell goblet squats", "sets": 3, "reps": "12-15", "rest_seconds": 90, "muscle_group": "legs"},
-            {"name": "Kettlebell Turkish get-ups", "sets": 2, "reps": "5 each side", "rest_seconds": 120, "muscle_group": "full body"}
-        ],
-        'pull_up_bar': [
-            {"name": "Pull-ups", "sets": 3, "reps": "5-10", "rest_seconds": 120, "muscle_group": "back"},
-            {"name": "Chin-ups", "sets": 3, "reps": "5-8", "rest_seconds": 120, "muscle_group": "back"}
-        ]
+# Text shared by every generated plan (and by the OpenAI fallback plan); plans
+# reference these objects instead of allocating copies per day
+STANDARD_INSTRUCTIONS = sys.intern("Focus on proper form and controlled movement")
+RECOVERY_ACTIVITIES = ("light stretching", "walk", "meditation")
+
+
+class Ex(NamedTuple):
+    """A template exercise; instructions are added when the plan is built."""
+    name: str
+    sets: int
+    reps: str
+    rest_seconds: int
+    muscle_group: str
+
+
+# Equipment-based exercise templates
+EXERCISE_TEMPLATES = {
+    'bodyweight': (
+        Ex("Push-ups", 3, "10-15", 60, "chest"),
+        Ex("Squats", 3, "15-20", 60, "legs"),
+        Ex("Planks", 3, "30-45 sec", 45, "core"),
+        Ex("Lunges", 3, "10 each leg", 60, "legs"),
+        Ex("Mountain climbers", 3, "20 sec", 40, "cardio"),
+        Ex("Burpees", 3, "8-10", 90, "full body"),
+        Ex("Jumping jacks", 3, "30 sec", 30, "cardio")
+    ),
+    'dumbbells': (
+        Ex("Dumbbell bench press", 3, "10-12", 90, "chest"),
+        Ex("Dumbbell rows", 3, "10-12", 90, "back"),
+        Ex("Dumbbell squats", 3, "12-15", 90, "legs"),
+        Ex("Dumbbell shoulder press", 3, "10-12", 75, "shoulders"),
+        Ex("Dumbbell bicep curls", 3, "12-15", 60, "arms")
+    ),
+    'kettlebells': (
+        Ex("Kettlebell swings", 3, "15-20", 90, "full body"),
+        Ex("Kettlebell goblet squats", 3, "12-15", 90, "legs"),
+        Ex("Kettlebell Turkish get-ups", 2, "5 each side", 120, "full body")
+    ),
+    'pull_up_bar': (
+        Ex("Pull-ups", 3, "5-10", 120, "back"),
+        Ex("Chin-ups", 3, "5-8", 120, "back")
+    )
+}
+
+
+# Goal keywords, checked in order, and the weekly structure each selects;
+# goals matching none of them get the general fitness week
+_GOAL_KEYWORDS = (
+    ('strength_muscle', ('strength', 'muscle')),
+    ('cardio_endurance', ('cardio', 'endurance')),
+)
+
+_WEEKLY_STRUCTURES = {
+    'strength_muscle': {
+        'monday': {'focus': 'Upper Body Strength', 'type': 'strength'},
+        'tuesday': {'focus': 'Lower Body Strength', 'type': 'strength'},
+        'wednesday': {'focus': 'Cardio & Core', 'type': 'cardio'},
+        'thursday': {'focus': 'Upper Body Power', 'type': 'strength'},
+        'friday': {'focus': 'Full Body', 'type': 'full_body'},
+        'saturday': {'focus': 'Active Recovery', 'type': 'recovery'},
+        'sunday': {'focus': 'Rest', 'type': 'rest'}
+    },
+    'cardio_endurance': {
+        'monday': {'focus': 'HIIT Cardio', 'type': 'cardio'},
+        'tuesday': {'focus': 'Strength Training', 'type': 'strength'},
+        'wednesday': {'focus': 'Steady State Cardio', 'type': 'cardio'},
+        'thursday': {'focus': 'Upper Body', 'type': 'strength'},
+        'friday': {'focus': 'Circuit Training', 'type': 'full_body'},
+        'saturday': {'focus': 'Low Intensity Cardio', 'type': 'recovery'},
+        'sunday': {'focus': 'Rest', 'type': 'rest'}
+    },
+    'general': {
+        'monday': {'focus': 'Upper Body', 'type': 'strength'},
+        'tuesday': {'focus': 'Lower Body', 'type': 'strength'},
+        'wednesday': {'focus': 'Cardio', 'type': 'cardio'},
+        'thursday': {'focus': 'Full Body', 'type': 'full_body'},
+        'friday': {'focus': 'Core & Flexibility', 'type': 'core'},
+        'saturday': {'focus': 'Active Recovery', 'type': 'recovery'},
+        'sunday': {'focus': 'Rest', 'type': 'rest'}
     }
-    
-    # Get available exercises based on equipment
+}
+
+
+def weekly_structure_for_goal(weekly_goal: str) -> Dict[str, Dict[str, str]]:
+    """Return the focus and type of each day of the week for a weekly goal."""
+    goal = weekly_goal.lower()
+    structure_key = next((key for key, keywords in _GOAL_KEYWORDS if any(k in goal for k in keywords)), 'general')
+    return _WEEKLY_STRUCTURES[structure_key]
+
+
+@lru_cache(maxsize=64)
+def _exercise_pools(equipment: FrozenSet[str]) -> Dict[str, Tuple[Ex, ...]]:
+    """Partition the exercises available with this equipment by day type, once per equipment set."""
     available_exercises = []
-    for eq in equipment:
-        if eq in exercise_templates:
-            available_exercises.extend(exercise_templates[eq])
+    for eq in EXERCISE_TEMPLATES:
+        if eq in equipment and eq != 'bodyweight':
+            available_exercises.extend(EXERCISE_TEMPLATES[eq])
     
     # Always include bodyweight exercises
     if 'bodyweight' in equipment or not available_exercises:
-        available_exercises.extend(exercise_templates['bodyweight'])
+        available_exercises.extend(EXERCISE_TEMPLATES['bodyweight'])
+    
+    return {
+        'cardio': tuple(ex for ex in available_exercises if 'cardio' in ex.muscle_group or 'full body' in ex.muscle_group),
+        'strength': tuple(ex for ex in available_exercises if ex.muscle_group != 'cardio'),
+        'all': tuple(available_exercises)
+    }
+
+
+def generate_simple_weekly_plan(equipment: List[str], daily_duration: int, weekly_goal: str) -> Dict[str, Any]:
+    """Generate a simple weekly workout plan without OpenAI."""
+    
+    # Get available exercises based on equipment
+    pools = _exercise_pools(frozenset(equipment))
     
     # Define weekly structure based on goal
-    if 'strength' in weekly_goal.lower() or 'muscle' in weekly_goal.lower():
-        weekly_structure = {
-            'monday': {'focus': 'Upper Body Strength', 'type': 'strength'},
-            'tuesday': {'focus': 'Lower Body Strength', 'type': 'strength'},
-            'wednesday': {'focus': 'Cardio & Core', 'type': 'cardio'},
-            'thursday': {'focus': 'Upper Body Power', 'type': 'strength'},
-            'friday': {'focus': 'Full Body', 'type': 'full_body'},
-            'saturday': {'focus': 'Active Recovery', 'type': 'recovery'},
-            'sunday': {'focus': 'Rest', 'type': 'rest'}
-        }
-    elif 'cardio' in weekly_goal.lower() or 'endurance' in weekly_goal.lower():
-        weekly_structure = {
-            'monday': {'focus': 'HIIT Cardio', 'type': 'cardio'},
-            'tuesday': {'focus': 'Strength Training', 'type': 'strength'},
-            'wednesday': {'focus': 'Steady State Cardio', 'type': 'cardio'},
-            'thursday': {'focus': 'Upper Body', 'type': 'strength'},
-            'friday': {'focus': 'Circuit Training', 'type': 'full_body'},
-            'saturday': {'focus': 'Low Intensity Cardio', 'type': 'recovery'},
-            'sunday': {'focus': 'Rest', 'type': 'rest'}
-        }
-    else:  # General fitness
-        weekly_structure = {
-            'monday': {'focus': 'Upper Body', 'type': 'strength'},
-            'tuesday': {'focus': 'Lower Body', 'type': 'strength'},
-            'wednesday': {'focus': 'Cardio', 'type': 'cardio'},
-            'thursday': {'focus': 'Full Body', 'type': 'full_body'},
-            'friday': {'focus': 'Core & Flexibility', 'type': 'core'},
-            'saturday': {'focus': 'Active Recovery', 'type': 'recovery'},
-            'sunday': {'focus': 'Rest', 'type': 'rest'}
-        }
+    weekly_structure = weekly_structure_for_goal(weekly_goal)
     
     # Generate daily workouts
     daily_workouts = {}
+    # One shuffled deck per pool; days deal consecutive windows from it so the
+    # same exercises are not repeated until the pool has been used up
+    decks = {}
+    positions = {}
     
     for day, info in weekly_structure.items():
         if info['type'] == 'rest':
@@ -91,32 +141,39 @@ def generate_simple_weekly_plan(equipment: List[str], daily_duration: int, weekl
                 "rest_day": True,
                 "exercises": [],
                 "duration_minutes": 0,
-                "recovery_activities": ["light stretching", "walk", "meditation"]
+                "recovery_activities": RECOVERY_ACTIVITIES
             }
         else:
             # Select exercises for this day
             day_exercises = []
             target_exercises = min(6, max(3, daily_duration // 8))  # Rough estimate
             
-            # Filter exercises by type and muscle group
-            if info['type'] == 'cardio':
-                filtered = [ex for ex in available_exercises if 'cardio' in ex['muscle_group'] or 'full body' in ex['muscle_group']]
-            elif info['type'] == 'strength':
-                filtered = [ex for ex in available_exercises if ex['muscle_group'] not in ['cardio']]
-            else:
-                filtered = available_exercises
+            # Exercises matching the day type (cardio and strength days are filtered)
+            pool = info['type'] if info['type'] in pools else 'all'
+            if pool not in decks:
+                decks[pool] = list(pools[pool])
+                random.shuffle(decks[pool])
+                positions[pool] = 0
             
-            # Select random exercises
-            selected = random.sample(filtered, min(target_exercises, len(filtered)))
+            # Deal the next window of exercises from the deck; when too few are
+            # left for the day, reshuffle so days never repeat the same window
+            deck = decks[pool]
+            start = positions[pool]
+            count = min(target_exercises, len(deck))
+            if start + count > len(deck):
+                random.shuffle(deck)
+                start = 0
+            selected = deck[start:start + count]
+            positions[pool] = start + count
             
             for exercise in selected:
                 day_exercises.append({
-                    "name": exercise["name"],
-                    "sets": exercise["sets"],
-                    "reps": exercise["reps"],
-                    "rest_seconds": exercise["rest_seconds"],
-                    "instructions": "Focus on proper form and controlled movement",
-                    "muscle_group": exercise["muscle_group"]
+                    "name": exercise.name,
+                    "sets": exercise.sets,
+                    "reps": exercise.reps,
+                    "rest_seconds": exercise.rest_seconds,
+                    "instructions": STANDARD_INSTRUCTIONS,
+                    "muscle_group": exercise.muscle_group
                 })
             
             daily_workouts[day] = {
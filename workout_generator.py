@@ -1,36 +1,117 @@
-import json
 import random
-from typing import List, Dict, Any
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from itertools import cycle, islice
+from typing import List, Dict, Any, FrozenSet, Iterable, NamedTuple, Optional, Tuple
 import logging
 
+import orjson
+
+# Parsed exercise catalogue, shared by every WorkoutGenerator (see _get_exercises)
+_EXERCISES_CACHE: Optional[Tuple[Dict[str, Any], ...]] = None
+
+
+def _load_exercises() -> Tuple[Dict[str, Any], ...]:
+    """Load exercise data from JSON file.
+
+    The catalogue is read-only after loading, so it is kept in a tuple that
+    preloaded gunicorn workers can share copy-on-write.
+    """
+    try:
+        with open('exercises.json', 'rb') as f:
+            return tuple(orjson.loads(f.read()))
+    except FileNotFoundError:
+        logging.error("exercises.json not found")
+        return ()
+    except orjson.JSONDecodeError:
+        logging.error("Invalid JSON in exercises.json")
+        return ()
+
+
+def _get_exercises() -> Tuple[Dict[str, Any], ...]:
+    """Return the exercise catalogue, reading exercises.json only on first use."""
+    global _EXERCISES_CACHE
+    if _EXERCISES_CACHE is None:
+        exercises = _load_exercises()
+        if not exercises:
+            # Leave the cache empty so the next generator retries the load
+            return exercises
+        _EXERCISES_CACHE = exercises
+    return _EXERCISES_CACHE
+
+
+class _ExerciseInfo(NamedTuple):
+    """Fields derived from a catalogue exercise, computed once when the generator loads.
+
+    Kept beside the exercise dicts rather than in them, since the dicts are
+    returned to templates and JSON responses as they are.
+    """
+    equipment_mask: int
+    muscle_group: str
+    type: str
+    name_lower: str
+    duration: int
+
+
+class _ExercisePool(NamedTuple):
+    """The exercises one equipment selection allows, grouped ready for balancing."""
+    exercises: Tuple[Dict[str, Any], ...]
+    muscle_groups: Dict[str, Tuple[Dict[str, Any], ...]]
+    groups_by_duration: Dict[str, Tuple[Dict[str, Any], ...]]
+    group_durations: Dict[str, Tuple[int, ...]]
+    warmup: Tuple[Dict[str, Any], ...]
+    cooldown: Tuple[Dict[str, Any], ...]
+
+
 class WorkoutGenerator:
     """Handles workout generation logic based on user preferences."""
     
     def __init__(self):
         """Initialize the workout generator with exercise data."""
-        self.exercises = self._load_exercises()
+        self.exercises = _get_exercises()
         self.equipment_mapping = {
-            'bodyweight': [],
-            'dumbbells': ['dumbbell'],
-            'kettlebells': ['kettlebell'],
-            'resistance_bands': ['resistance_band'],
-            'pull_up_bar': ['pull_up_bar'],
-            'bench': ['bench'],
-            'barbell': ['barbell'],
-            'medicine_ball': ['medicine_ball']
+            'bodyweight': (),
+            'dumbbells': ('dumbbell',),
+            'kettlebells': ('kettlebell',),
+            'resistance_bands': ('resistance_band',),
+            'pull_up_bar': ('pull_up_bar',),
+            'bench': ('bench',),
+            'barbell': ('barbell',),
+            'medicine_ball': ('medicine_ball',)
         }
-    
-    def _load_exercises(self) -> List[Dict[str, Any]]:
-        """Load exercise data from JSON file."""
-        try:
-            with open('exercises.json', 'r') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            logging.error("exercises.json not found")
-            return []
-        except json.JSONDecodeError:
-            logging.error("Invalid JSON in exercises.json")
-            return []
+        # One bit per equipment item the catalogue mentions, so "has everything
+        # this exercise needs" is a single integer test
+        self._equipment_bits = {}
+        for ex in self.exercises:
+            for item in ex.get('equipment_needed', []):
+                self._equipment_bits.setdefault(item, 1 << len(self._equipment_bits))
+        # Derived fields for each exercise, keyed by id() of its (shared, never freed) dict
+        self._info = {
+            id(ex): _ExerciseInfo(
+                equipment_mask=self._equipment_mask(ex.get('equipment_needed', [])),
+                muscle_group=ex.get('muscle_group', 'other'),
+                type=ex.get('type', 'other'),
+                name_lower=ex.get('name', '').lower(),
+                duration=self._calculate_exercise_duration(ex)
+            )
+            for ex in self.exercises
+        }
+        # Warm-up and cool-down candidates from the whole catalogue; each workout
+        # narrows them to the exercises its equipment allows
+        self._warmup_pool = tuple(
+            ex for ex in self.exercises
+            if self._info[id(ex)].type == 'cardio' or 'warm' in self._info[id(ex)].name_lower
+        )
+        self._cooldown_pool = tuple(
+            ex for ex in self.exercises
+            if self._info[id(ex)].type == 'flexibility' or 'stretch' in self._info[id(ex)].name_lower
+        )
+        # Filtered and grouped catalogue per equipment selection; users rarely
+        # change their equipment, so only the random balancing runs per request
+        self._exercise_pool = lru_cache(maxsize=64)(self._build_exercise_pool)
+        # Pools for the most common selections, built by prebuild_pools() and never evicted
+        self._prebuilt_pools: Dict[FrozenSet[str], _ExercisePool] = {}
     
     def _calculate_exercise_duration(self, exercise: Dict[str, Any]) -> int:
         """Calculate total duration for an exercise in seconds."""
@@ -45,7 +126,14 @@ class WorkoutGenerator:
         
         return exercise_time + rest_time
     
-    def _filter_exercises_by_equipment(self, available_equipment: List[str]) -> List[Dict[str, Any]]:
+    def _equipment_mask(self, items: Iterable[str]) -> int:
+        """Combine the bits of the given equipment items, ignoring any the catalogue never needs."""
+        mask = 0
+        for item in items:
+            mask |= self._equipment_bits.get(item, 0)
+        return mask
+    
+    def _filter_exercises_by_equipment(self, available_equipment: FrozenSet[str]) -> Tuple[Dict[str, Any], ...]:
         """Filter exercises based on available equipment."""
         # Convert user equipment selection to equipment needed format
         user_equipment = set()
@@ -57,92 +145,119 @@ class WorkoutGenerator:
         if 'bodyweight' in available_equipment:
             user_equipment.add('')  # Empty string for bodyweight
         
-        filtered_exercises = []
-        for exercise in self.exercises:
-            equipment_needed = set(exercise.get('equipment_needed', []))
-            
-            # If exercise needs no equipment (bodyweight) or all needed equipment is available
-            if not equipment_needed or equipment_needed.issubset(user_equipment):
-                filtered_exercises.append(exercise)
+        # Bits for equipment the user lacks; bodyweight exercises need none (mask 0)
+        missing = ~self._equipment_mask(user_equipment)
+        info = self._info
+        return tuple(ex for ex in self.exercises if not info[id(ex)].equipment_mask & missing)
+    
+    def _build_exercise_pool(self, available_equipment: FrozenSet[str]) -> _ExercisePool:
+        """Filter and group the exercises for an equipment selection (memoized per instance as _exercise_pool)."""
+        info = self._info
+        exercises = self._filter_exercises_by_equipment(available_equipment)
+        
+        # Group exercises by muscle group for balanced selection
+        muscle_groups = defaultdict(list)
+        for exercise in exercises:
+            muscle_groups[info[id(exercise)].muscle_group].append(exercise)
         
-        return filtered_exercises
+        # Each group again, shortest first, for finding an exercise that fits the time left
+        groups_by_duration = {
+            muscle_group: tuple(sorted(group, key=lambda ex: info[id(ex)].duration))
+            for muscle_group, group in muscle_groups.items()
+        }
+        
+        available_ids = {id(ex) for ex in exercises}
+        return _ExercisePool(
+            exercises=exercises,
+            muscle_groups={muscle_group: tuple(group) for muscle_group, group in muscle_groups.items()},
+            groups_by_duration=groups_by_duration,
+            group_durations={
+                muscle_group: tuple(info[id(ex)].duration for ex in group)
+                for muscle_group, group in groups_by_duration.items()
+            },
+            warmup=tuple(ex for ex in self._warmup_pool if id(ex) in available_ids),
+            cooldown=tuple(ex for ex in self._cooldown_pool if id(ex) in available_ids)
+        )
     
-    def _create_balanced_workout(self, exercises: List[Dict[str, Any]], target_duration_minutes: int) -> Dict[str, Any]:
+    def _create_balanced_workout(self, pool: _ExercisePool, target_duration_minutes: int) -> Dict[str, Any]:
         """Create a balanced workout plan within the target duration."""
         target_duration_seconds = target_duration_minutes * 60
         selected_exercises = []
+        selected_ids = set()
         total_duration = 0
         
-        # Group exercises by muscle group for balanced selection
-        muscle_groups = {}
-        for exercise in exercises:
-            muscle_group = exercise.get('muscle_group', 'other')
-            if muscle_group not in muscle_groups:
-                muscle_groups[muscle_group] = []
-            muscle_groups[muscle_group].append(exercise)
-        
-        # Ensure we have a variety of exercise types
-        exercise_types = {}
-        for exercise in exercises:
-            exercise_type = exercise.get('type', 'other')
-            if exercise_type not in exercise_types:
-                exercise_types[exercise_type] = []
-            exercise_types[exercise_type].append(exercise)
+        info = self._info
+        muscle_groups = pool.muscle_groups
+        groups_by_duration = pool.groups_by_duration
+        group_durations = pool.group_durations
         
         # Start with a warm-up exercise if available
-        warmup_exercises = [ex for ex in exercises if ex.get('type') == 'cardio' or 'warm' in ex.get('name', '').lower()]
+        warmup_exercises = pool.warmup
         if warmup_exercises and total_duration < target_duration_seconds:
             warmup = random.choice(warmup_exercises)
-            warmup_duration = self._calculate_exercise_duration(warmup)
+            warmup_duration = info[id(warmup)].duration
             if total_duration + warmup_duration <= target_duration_seconds:
                 selected_exercises.append(warmup)
+                selected_ids.add(id(warmup))
                 total_duration += warmup_duration
         
         # Add main exercises, rotating through muscle groups
         muscle_group_keys = list(muscle_groups.keys())
-        current_group_index = 0
-        attempts = 0
-        max_attempts = len(exercises) * 2  # Prevent infinite loops
+        # Unused exercises per group, shuffled once so each pick is a pop from the end
+        unused = {}
+        for muscle_group, group in muscle_groups.items():
+            unused[muscle_group] = list(group)
+            random.shuffle(unused[muscle_group])
+        max_attempts = len(pool.exercises) * 2  # Prevent infinite loops
+        exhausted = set()
         
-        while total_duration < target_duration_seconds * 0.9 and attempts < max_attempts:
-            attempts += 1
+        # Every attempt moves on to the next group, so round-robin is a plain cycle
+        for current_group in islice(cycle(muscle_group_keys), max_attempts):
+            if total_duration >= target_duration_seconds * 0.9:
+                break
+            if current_group in exhausted:
+                continue
             
             # Try to select from current muscle group
-            if muscle_group_keys:
-                current_group = muscle_group_keys[current_group_index % len(muscle_group_keys)]
-                available_exercises = [ex for ex in muscle_groups[current_group] 
-                                     if ex not in selected_exercises]
+            available_exercises = unused[current_group]
+            # Drop exercises already taken as the warm-up or a shorter fit
+            while available_exercises and id(available_exercises[-1]) in selected_ids:
+                available_exercises.pop()
+            
+            if available_exercises:
+                exercise = available_exercises.pop()
+                exercise_duration = info[id(exercise)].duration
                 
-                if available_exercises:
-                    exercise = random.choice(available_exercises)
-                    exercise_duration = self._calculate_exercise_duration(exercise)
-                    
-                    # Check if adding this exercise would exceed target duration
-                    if total_duration + exercise_duration <= target_duration_seconds:
+                # Check if adding this exercise would exceed target duration
+                if total_duration + exercise_duration <= target_duration_seconds:
+                    selected_exercises.append(exercise)
+                    selected_ids.add(id(exercise))
+                    total_duration += exercise_duration
+                else:
+                    # Try to find a shorter exercise: the longest unused one that still fits
+                    candidates = groups_by_duration[current_group]
+                    i = bisect_right(group_durations[current_group], target_duration_seconds - total_duration) - 1
+                    while i >= 0 and id(candidates[i]) in selected_ids:
+                        i -= 1
+                    if i >= 0:
+                        exercise = candidates[i]
+                        exercise_duration = group_durations[current_group][i]
                         selected_exercises.append(exercise)
+                        selected_ids.add(id(exercise))
                         total_duration += exercise_duration
-                        current_group_index += 1
-                    else:
-                        # Try to find a shorter exercise
-                        shorter_exercises = [ex for ex in available_exercises 
-                                           if self._calculate_exercise_duration(ex) <= target_duration_seconds - total_duration]
-                        if shorter_exercises:
-                            exercise = min(shorter_exercises, key=self._calculate_exercise_duration)
-                            exercise_duration = self._calculate_exercise_duration(exercise)
-                            selected_exercises.append(exercise)
-                            total_duration += exercise_duration
-                        break
-                else:
-                    current_group_index += 1
+                    break
             else:
-                break
+                # Nothing left to pick from this group; stop once every group is used up
+                exhausted.add(current_group)
+                if len(exhausted) == len(muscle_group_keys):
+                    break
         
         # Add cool-down if there's time and space
         if total_duration < target_duration_seconds * 0.95:
-            cooldown_exercises = [ex for ex in exercises if ex.get('type') == 'flexibility' or 'stretch' in ex.get('name', '').lower()]
+            cooldown_exercises = pool.cooldown
             if cooldown_exercises:
                 cooldown = random.choice(cooldown_exercises)
-                cooldown_duration = self._calculate_exercise_duration(cooldown)
+                cooldown_duration = info[id(cooldown)].duration
                 if total_duration + cooldown_duration <= target_duration_seconds:
                     selected_exercises.append(cooldown)
                     total_duration += cooldown_duration
@@ -154,12 +269,21 @@ class WorkoutGenerator:
             'exercise_count': len(selected_exercises)
         }
     
+    def prebuild_pools(self, equipment_combos: Iterable[Iterable[str]]) -> None:
+        """Build the exercise pools for common equipment selections ahead of the first request."""
+        for combo in equipment_combos:
+            key = frozenset(combo)
+            self._prebuilt_pools[key] = self._build_exercise_pool(key)
+    
     def generate_workout(self, equipment: List[str], duration_minutes: int) -> Dict[str, Any]:
         """Generate a complete workout plan."""
         # Filter exercises by available equipment
-        available_exercises = self._filter_exercises_by_equipment(equipment)
+        key = frozenset(equipment)
+        pool = self._prebuilt_pools.get(key)
+        if pool is None:
+            pool = self._exercise_pool(key)
         
-        if not available_exercises:
+        if not pool.exercises:
             return {
                 'exercises': [],
                 'total_duration_minutes': 0,
@@ -169,6 +293,6 @@ class WorkoutGenerator:
             }
         
         # Create balanced workout
-        workout_plan = self._create_balanced_workout(available_exercises, duration_minutes)
+        workout_plan = self._create_balanced_workout(pool, duration_minutes)
         
         return workout_plan